@@ -6,19 +6,23 @@ This script extracts user and assistant chat history from Gemini shared chat URL
 """
 
 import asyncio
-import json
 import sys
 from datetime import datetime
 from pathlib import Path
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
 from bs4 import BeautifulSoup
 
+# Shared helpers live one directory up, in scripts/browser_utils.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from browser_utils import MAX_CONCURRENT_URLS, dump_html, dump_json, dump_summary, run_async
 
-async def extract_gemini_chat(url: str, output_dir: str = "output") -> dict:
+
+async def extract_gemini_chat(crawler, url: str, output_dir: str = "output") -> dict:
     """
     Extract chat history from a Gemini shared chat URL.
 
     Args:
+        crawler: Started AsyncWebCrawler shared by all URLs
         url: The Gemini shared chat URL
         output_dir: Directory to save the extracted chat history
 
@@ -31,19 +35,6 @@ async def extract_gemini_chat(url: str, output_dir: str = "output") -> dict:
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    # Configure browser with anti-detection settings
-    browser_config = BrowserConfig(
-        browser_type="chromium",
-        headless=True,
-        verbose=True,
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-        extra_args=[
-            "--disable-blink-features=AutomationControlled",
-            "--disable-dev-shm-usage",
-            "--no-sandbox",
-        ]
-    )
-
     # Configure crawler run with stealth
     run_config = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
@@ -65,117 +56,65 @@ async def extract_gemini_chat(url: str, output_dir: str = "output") -> dict:
         remove_overlay_elements=True,
     )
 
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        result = await crawler.arun(url=url, config=run_config)
-
-        if not result.success:
-            print(f"Failed to crawl {url}: {result.error_message}")
-            return {"error": result.error_message, "url": url}
-
-        print(f"Response status: {result.status_code if hasattr(result, 'status_code') else 'unknown'}")
-        print(f"HTML length: {len(result.html) if result.html else 0}")
-        print(f"Final URL: {result.url if hasattr(result, 'url') else 'unknown'}")
-
-        # Save raw HTML for debugging
-        url_hash = url.split('/')[-1]
-        html_debug_file = output_path / f"gemini_chat_{url_hash}_debug.html"
-        with open(html_debug_file, 'w', encoding='utf-8') as f:
-            f.write(result.html if result.html else "No HTML content")
-        print(f"Debug HTML saved to: {html_debug_file}")
-
-        # Parse the HTML content
-        soup = BeautifulSoup(result.html, 'html.parser')
-
-        # Extract chat messages
-        messages = []
-
-        # Try different selectors for Gemini chat structure
-        # Gemini typically uses specific classes for messages
-        selectors = [
-            '.conversation-turn',
-            '[class*="message"]',
-            '[class*="chat"]',
-            '[data-message-author]',
-            '.model-response-text',
-            '.user-query'
-        ]
+    result = await crawler.arun(url=url, config=run_config)
 
-        # Try to find message containers
-        message_elements = []
-        for selector in selectors:
-            found = soup.select(selector)
-            if found:
-                print(f"Found {len(found)} elements with selector: {selector}")
-                message_elements = found
-                break
-
-        # If we still don't have messages, try a more general approach
-        if not message_elements:
-            print("Trying general text extraction...")
-            # Look for any text content in the page
-            main_content = soup.find('main') or soup.find('body')
-            if main_content:
-                # Extract all text blocks
-                text_blocks = main_content.find_all(['p', 'div', 'span'])
-                message_elements = [block for block in text_blocks if block.get_text(strip=True)]
-
-        # Process found elements
-        for idx, element in enumerate(message_elements):
-            text = element.get_text(strip=True)
-            if text:
-                # Try to determine if it's a user or assistant message
-                classes = ' '.join(element.get('class', []))
-                role = 'assistant'  # Default
+    if not result.success:
+        print(f"Failed to crawl {url}: {result.error_message}")
+        return {"error": result.error_message, "url": url}
 
-                if any(keyword in classes.lower() for keyword in ['user', 'prompt', 'query']):
-                    role = 'user'
-                elif any(keyword in classes.lower() for keyword in ['model', 'response', 'assistant']):
-                    role = 'assistant'
+    print(f"Response status: {result.status_code if hasattr(result, 'status_code') else 'unknown'}")
+    print(f"HTML length: {len(result.html) if result.html else 0}")
+    print(f"Final URL: {result.url if hasattr(result, 'url') else 'unknown'}")
 
+    # Save raw HTML for debugging
+    url_hash = url.split('/')[-1]
+    html_debug_file = output_path / f"gemini_chat_{url_hash}_debug.html.gz"
+    await dump_html(result.html if result.html else "No HTML content", html_debug_file)
+    print(f"Debug HTML saved to: {html_debug_file}")
+
+    # Parse the HTML content
+    soup = BeautifulSoup(result.html, 'lxml')
+
+    # Extract chat messages
+    messages = []
+
+    # Each share-turn-viewer holds one user query and one model response
+    turns = soup.select('share-turn-viewer')
+    print(f"Found {len(turns)} conversation turns")
+
+    for turn_idx, turn in enumerate(turns):
+        for role, selector in (
+            ('user', 'user-query div.query-text'),
+            ('assistant', 'message-content div.markdown'),
+        ):
+            element = turn.select_one(selector)
+            text = element.get_text('\n', strip=True) if element else ''
+            if text:
                 messages.append({
-                    'index': idx,
+                    'index': len(messages),
+                    'turn': turn_idx,
                     'role': role,
                     'content': text,
-                    'element_class': classes
                 })
 
-        # If we got very few messages, also save the markdown content
-        if len(messages) < 5:
-            print("Low message count, including markdown extraction...")
-            markdown_text = result.markdown
-
-            # Try to split by common patterns
-            if markdown_text:
-                # Split by common delimiters
-                splits = markdown_text.split('\n\n')
-                for idx, text_block in enumerate(splits):
-                    if text_block.strip():
-                        messages.append({
-                            'index': len(messages),
-                            'role': 'unknown',
-                            'content': text_block.strip(),
-                            'source': 'markdown'
-                        })
-
-        # Create result object
-        chat_data = {
-            'url': url,
-            'timestamp': datetime.now().isoformat(),
-            'message_count': len(messages),
-            'messages': messages,
-            'raw_markdown': result.markdown[:5000] if result.markdown else None,  # First 5000 chars for reference
-        }
-
-        # Save to file
-        output_file = output_path / f"gemini_chat_{url_hash}.json"
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(chat_data, f, indent=2, ensure_ascii=False)
-
-        print(f"Extracted {len(messages)} messages")
-        print(f"Saved to: {output_file}")
-
-        return chat_data
+    # Create result object
+    chat_data = {
+        'url': url,
+        'timestamp': datetime.now().isoformat(),
+        'message_count': len(messages),
+        'messages': messages,
+        'raw_markdown': result.markdown[:5000] if result.markdown else None,  # First 5000 chars for reference
+    }
+
+    # Save to file
+    output_file = output_path / f"gemini_chat_{url_hash}.json"
+
+    await dump_json(chat_data, output_file)
+
+    print(f"Extracted {len(messages)} messages")
+    print(f"Saved to: {output_file}")
+
+    return chat_data
 
 
 async def main():
@@ -194,31 +133,51 @@ async def main():
     print(f"Extracting chat history from {len(urls)} URL(s)...")
     print("=" * 60)
 
-    results = []
-    for url in urls:
-        try:
-            result = await extract_gemini_chat(url)
-            results.append(result)
-            print("=" * 60)
-        except Exception as e:
-            print(f"Error processing {url}: {e}")
-            results.append({"error": str(e), "url": url})
+    # Configure browser with anti-detection settings
+    browser_config = BrowserConfig(
+        browser_type="chromium",
+        headless=True,
+        verbose=True,
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+        extra_args=[
+            "--disable-blink-features=AutomationControlled",
+            "--disable-dev-shm-usage",
+            "--no-sandbox",
+        ]
+    )
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_URLS)
+
+    # One crawler (and browser) serves every URL
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+
+        async def run(url):
+            async with semaphore:
+                try:
+                    result = await extract_gemini_chat(crawler, url)
+                    print("=" * 60)
+                    return result
+                except Exception as e:
+                    print(f"Error processing {url}: {e}")
+                    return {"error": str(e), "url": url}
+
+        # Extract all URLs concurrently (bounded by the semaphore)
+        results = await asyncio.gather(*(run(url) for url in urls))
 
     # Save combined results
     output_path = Path("output")
     output_path.mkdir(parents=True, exist_ok=True)
 
-    summary_file = output_path / f"extraction_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'timestamp': datetime.now().isoformat(),
-            'total_urls': len(urls),
-            'results': results
-        }, f, indent=2, ensure_ascii=False)
+    summary_file = output_path / f"extraction_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json.gz"
+    await dump_summary({
+        'timestamp': datetime.now().isoformat(),
+        'total_urls': len(urls),
+        'results': results
+    }, summary_file)
 
     print(f"\nSummary saved to: {summary_file}")
     print(f"\nProcessed {len(urls)} URL(s) successfully!")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
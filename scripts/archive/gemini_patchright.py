@@ -4,64 +4,266 @@ Gemini Chat History Extractor using Patchright (Stealth Playwright)
 """
 
 import asyncio
-import json
+import gzip
+import os
+import re
 import sys
 from datetime import datetime
 from pathlib import Path
-from patchright.async_api import async_playwright
-from bs4 import BeautifulSoup
-
-
-async def extract_gemini_chat(url: str, output_dir: str = "output") -> dict:
-    """Extract chat history from a Gemini shared chat URL."""
-    print(f"Fetching chat from: {url}")
-
-    # Create output directory
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-
-    async with async_playwright() as p:
-        # Launch browser with patchright (stealth mode is automatic)
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--ignore-certificate-errors',
-                '--ignore-certificate-errors-spki-list',
-                '--disable-web-security'
-            ]
-        )
-
-        # Create new page with ignore https errors
-        context = await browser.new_context(ignore_https_errors=True)
-        page = await context.new_page()
+import aiohttp
+import orjson
+from patchright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from selectolax.lexbor import LexborHTMLParser
+
+# Shared helpers live one directory up, in scripts/browser_utils.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from browser_utils import JSON_OPTIONS, MAX_CONCURRENT_URLS, block_heavy_resources, dump_summary, run_async
+
+# Class-name keywords that mark an element as a likely chat message
+MESSAGE_CLASS_RE = re.compile(r'message|chat|conversation|turn|response|query')
+
+# User agent for the plain-HTTP fast path
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+
+# In-page version of parse_page(): returns the title, the text preview and
+# [content, element, classes] candidates so the DOM never crosses CDP.
+# Keep its candidate rules in sync with parse_page()
+PAGE_EXTRACT_JS = """
+    ({pattern, previewChars}) => {
+        const keywords = new RegExp(pattern, 'i');
+        // Count code points like Python's len(), not UTF-16 units
+        const codePointLength = text => [...text].length;
+        // Stripped, non-empty text nodes, like selectolax's text(strip=True)
+        const strippedTexts = (root, limit) => {
+            const parts = [];
+            const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+            let length = -1;
+            while (walker.nextNode()) {
+                const text = walker.currentNode.data.trim();
+                if (!text) continue;
+                parts.push(text);
+                length += codePointLength(text) + 1;
+                if (length >= limit) break;
+            }
+            return parts;
+        };
+        const title = document.querySelector('title');
+        const messages = [];
+        for (const elem of document.querySelectorAll('div[class], p[class], article[class], section[class]')) {
+            const classes = elem.getAttribute('class').split(/\\s+/).filter(Boolean).join(' ');
+            if (!keywords.test(classes)) continue;
+            const text = strippedTexts(elem, Infinity).join('');
+            if (codePointLength(text) > 30) messages.push([text, elem.localName, classes]);
+        }
+        return {
+            title: title ? title.textContent : null,
+            preview: document.body
+                ? [...strippedTexts(document.body, previewChars).join('\\n')].slice(0, previewChars).join('')
+                : null,
+            messages,
+        };
+    }
+"""
 
+# Chats with at least this many messages are written one message at a time
+STREAM_JSON_MIN_MESSAGES = 500
+
+# Number of page-text characters kept in full_text_preview
+TEXT_PREVIEW_CHARS = 2000
+
+
+async def launch_browser(p):
+    """Launch the patchright browser shared across URLs (stealth mode is automatic)."""
+    return await p.chromium.launch(
+        headless=True,
+        args=[
+            '--no-sandbox',
+            '--disable-setuid-sandbox',
+            '--ignore-certificate-errors',
+            '--ignore-certificate-errors-spki-list',
+            '--disable-web-security'
+        ]
+    )
+
+
+def text_preview(node, limit: int) -> str:
+    """Return the first `limit` chars of node.text(separator='\\n', strip=True).
+
+    Walks the text nodes and stops once enough text is collected, so the
+    full page text is never built just to be sliced.
+    """
+    parts = []
+    length = -1  # no separator before the first part
+    for child in node.traverse(include_text=True):
+        if child.tag != '-text':
+            continue
+        text = child.text_content.strip()
+        if text:
+            parts.append(text)
+            length += len(text) + 1
+            if length >= limit:
+                break
+    return '\n'.join(parts)[:limit]
+
+
+async def wait_for_network_idle(page, timeout: int):
+    """Wait until the network is idle, giving up quietly after `timeout` ms."""
+    try:
+        await page.wait_for_load_state('networkidle', timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+
+
+def parse_page(html):
+    """Parse the page HTML into (page_title, preview_text, messages).
+
+    The DOM only lives for the duration of this call, so it is freed before
+    the chat JSON is built and serialized.
+
+    Used for the plain-HTTP fast path; rendered pages go through
+    PAGE_EXTRACT_JS instead, which applies the same rules in the page.
+    Change both together.
+    """
+    tree = LexborHTMLParser(html)
+
+    # Look for the title to see if we got the right page
+    title = tree.css_first('title')
+    page_title = title.text() if title else None
+
+    # Extract messages as (content, element, classes) tuples; they become
+    # dicts only once, when the JSON is built
+    messages = []
+    preview_text = None
+
+    # Get all text content
+    body = tree.body
+    if body:
+        # Only the start of the page text is kept, so stop collecting there
+        preview_text = text_preview(body, TEXT_PREVIEW_CHARS)
+
+        # Try to find conversation structure
+        # Look for common patterns. Only elements with a class attribute
+        # can match the keywords, so let lexbor skip the rest in one walk
+        for elem in tree.css('div[class], p[class], article[class], section[class]'):
+            # Check if this looks like a message before paying for its text
+            classes = ' '.join((elem.attributes['class'] or '').split())
+            if not MESSAGE_CLASS_RE.search(classes.lower()):
+                continue
+            text = elem.text(strip=True)
+            if len(text) > 30:
+                messages.append((text, elem.tag, classes))
+
+    return page_title, preview_text, messages
+
+
+def write_gzip_text(path: Path, text: str):
+    """Write text to a gzip file (fast compression, debug artifacts only)."""
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        f.write(text)
+
+
+def write_chat_json(path: Path, chat_data: dict):
+    """Write chat_data exactly as orjson.dumps(chat_data, option=JSON_OPTIONS) would.
+
+    Long message lists are serialized one message at a time, so the bytes
+    for the whole document are never held in memory at once.
+    """
+    with open(path, 'wb') as f:
+        if len(chat_data['messages']) < STREAM_JSON_MIN_MESSAGES:
+            f.write(orjson.dumps(chat_data, option=JSON_OPTIONS))
+            return
+
+        # Rebuild the OPT_INDENT_2 layout; JSON strings never contain a raw
+        # newline, so nesting a dumped value is a plain byte replace
+        for i, (key, value) in enumerate(chat_data.items()):
+            f.write((b',' if i else b'{') + b'\n  ' + orjson.dumps(key) + b': ')
+            if key == 'messages':
+                f.write(b'[')
+                for j, message in enumerate(value):
+                    f.write(b',\n    ' if j else b'\n    ')
+                    f.write(orjson.dumps(message, option=JSON_OPTIONS).replace(b'\n', b'\n    '))
+                f.write(b'\n  ]' if value else b']')
+            else:
+                f.write(orjson.dumps(value, option=JSON_OPTIONS).replace(b'\n', b'\n  '))
+        f.write(b'\n}')
+
+
+async def fetch_html_over_http(url: str):
+    """Fetch a share page without a browser.
+
+    Returns (status, html_bytes) when the served HTML already contains the
+    conversation, otherwise None so the caller falls back to the browser.
+    """
+    try:
+        async with aiohttp.ClientSession(
+            headers={'User-Agent': USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=30),
+        ) as session:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    return None
+                html = await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+    if b'<message-content' not in html:
+        return None
+    return response.status, html
+
+
+async def extract_in_browser(browser, url: str, output_path: Path, url_hash: str, debug: bool):
+    """Render a share page in a fresh context and extract it in the page.
+
+    Returns (status, page_title, preview_text, messages) like parse_page().
+    """
+    # Create new context with ignore https errors (the browser is shared)
+    context = await browser.new_context(ignore_https_errors=True)
+    # Only the DOM text is used; keep images and CSS unless a debug
+    # screenshot needs the page to look right
+    if not debug:
+        await context.route('**/*', block_heavy_resources)
+    page = await context.new_page()
+
+    try:
+        # Navigate to the URL
+        print(f"Navigating to {url}...")
+        response = await page.goto(url, wait_until='domcontentloaded', timeout=60000)
+
+        status = response.status if response else None
+        print(f"Response status: {status or 'unknown'}")
+
+        # Wait for the conversation to render rather than a fixed delay
         try:
-            # Navigate to the URL
-            print(f"Navigating to {url}...")
-            response = await page.goto(url, wait_until='domcontentloaded', timeout=60000)
-
-            print(f"Response status: {response.status if response else 'unknown'}")
+            await page.wait_for_selector('message-content, [class*="conversation"]', timeout=5000)
+        except PlaywrightTimeoutError:
+            pass
 
-            # Wait for content
-            await asyncio.sleep(3)
-
-            # Try to scroll to load content (may fail if page crashed/403)
-            try:
-                await page.evaluate("() => { window.scrollTo(0, document.body.scrollHeight / 2); }")
-                await asyncio.sleep(1)
-                await page.evaluate("() => { window.scrollTo(0, document.body.scrollHeight); }")
-                await asyncio.sleep(2)
-            except Exception as e:
-                print(f"Could not execute JS (likely due to 403/crash): {e}")
+        # Try to scroll to load content (may fail if page crashed/403).
+        # Both scrolls run in one round-trip, then continue as soon as the
+        # lazy loads they triggered have finished
+        try:
+            await page.evaluate("""
+                async () => {
+                    window.scrollTo(0, document.body.scrollHeight / 2);
+                    await new Promise(resolve => setTimeout(resolve, 500));
+                    window.scrollTo(0, document.body.scrollHeight);
+                    await new Promise(resolve => requestAnimationFrame(resolve));
+                }
+            """)
+            await wait_for_network_idle(page, 2000)
+        except Exception as e:
+            print(f"Could not execute JS (likely due to 403/crash): {e}")
 
-            # Get page content
-            html_content = await page.content()
-            print(f"HTML length: {len(html_content)}")
+        # Scan the rendered DOM where it lives. response.body() would only be
+        # the HTML the server sent, before the conversation is built
+        # client-side and before the scrolling above loads anything
+        page_data = await page.evaluate(PAGE_EXTRACT_JS, {
+            'pattern': MESSAGE_CLASS_RE.pattern,
+            'previewChars': TEXT_PREVIEW_CHARS,
+        })
 
+        if debug:
             # Try to take screenshot for debugging
-            url_hash = url.split('/')[-1]
             try:
                 screenshot_file = output_path / f"gemini_chat_{url_hash}_screenshot.png"
                 await page.screenshot(path=str(screenshot_file))
@@ -70,67 +272,71 @@ async def extract_gemini_chat(url: str, output_dir: str = "output") -> dict:
                 print(f"Could not take screenshot: {e}")
 
             # Save debug HTML
-            html_debug_file = output_path / f"gemini_chat_{url_hash}_debug.html"
-            with open(html_debug_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            html_content = await page.content()
+            print(f"HTML length: {len(html_content)}")
+            html_debug_file = output_path / f"gemini_chat_{url_hash}_debug.html.gz"
+            await asyncio.to_thread(write_gzip_text, html_debug_file, html_content)
             print(f"Debug HTML saved to: {html_debug_file}")
 
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Look for the title to see if we got the right page
-            title = soup.find('title')
-            print(f"Page title: {title.text if title else 'No title found'}")
-
-            # Extract messages
-            messages = []
-
-            # Get all text content
-            body = soup.find('body')
-            if body:
-                # Extract all meaningful text
-                all_text = body.get_text(separator='\n', strip=True)
-                print(f"Total text length: {len(all_text)}")
-                print(f"First 500 chars: {all_text[:500]}")
-
-                # Try to find conversation structure
-                # Look for common patterns
-                for elem in soup.find_all(['div', 'p', 'article', 'section']):
-                    text = elem.get_text(strip=True)
-                    if text and len(text) > 30:
-                        # Check if this looks like a message
-                        classes = ' '.join(elem.get('class', []))
-                        if any(keyword in classes.lower() for keyword in ['message', 'chat', 'conversation', 'turn', 'response', 'query']):
-                            messages.append({
-                                'index': len(messages),
-                                'role': 'unknown',
-                                'content': text,
-                                'element': elem.name,
-                                'classes': classes
-                            })
-
-            # Save results
-            chat_data = {
-                'url': url,
-                'timestamp': datetime.now().isoformat(),
-                'status_code': response.status if response else None,
-                'page_title': title.text if title else None,
-                'message_count': len(messages),
-                'messages': messages,
-                'full_text_preview': all_text[:2000] if 'all_text' in locals() else None
-            }
+        return status, page_data['title'], page_data['preview'], page_data['messages']
 
-            output_file = output_path / f"gemini_chat_{url_hash}.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(chat_data, f, indent=2, ensure_ascii=False)
+    finally:
+        await context.close()
 
-            print(f"Extracted {len(messages)} messages")
-            print(f"Saved to: {output_file}")
 
-            return chat_data
+async def extract_gemini_chat(browser, url: str, output_dir: str = "output",
+                              debug: bool = False, http_first: bool = False) -> dict:
+    """Extract chat history from a Gemini shared chat URL.
 
-        finally:
-            await browser.close()
+    With debug=True a screenshot and the gzipped HTML are saved next to the
+    JSON. With http_first=True a plain GET is tried before the browser.
+    """
+    print(f"Fetching chat from: {url}")
+
+    # Create output directory
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    # Only the last path segment is needed, so split once from the right
+    url_hash = url.rsplit('/', 1)[-1]
+
+    fetched = await fetch_html_over_http(url) if http_first else None
+    if fetched:
+        print("Conversation served without JavaScript, skipping the browser")
+        status, html_content = fetched
+        page_title, preview_text, messages = parse_page(html_content)
+        # Neither the DOM nor the raw HTML is needed to build the JSON
+        del fetched, html_content
+    else:
+        status, page_title, preview_text, messages = await extract_in_browser(
+            browser, url, output_path, url_hash, debug
+        )
+
+    print(f"Page title: {page_title or 'No title found'}")
+    if preview_text is not None:
+        print(f"First 500 chars: {preview_text[:500]}")
+
+    # Save results
+    chat_data = {
+        'url': url,
+        'timestamp': datetime.now().isoformat(),
+        'status_code': status,
+        'page_title': page_title,
+        'message_count': len(messages),
+        'messages': [
+            {'index': i, 'role': 'unknown', 'content': text, 'element': tag, 'classes': classes}
+            for i, (text, tag, classes) in enumerate(messages)
+        ],
+        'full_text_preview': preview_text
+    }
+
+    output_file = output_path / f"gemini_chat_{url_hash}.json"
+    # Write in a worker thread so other URLs keep running during disk I/O
+    await asyncio.to_thread(write_chat_json, output_file, chat_data)
+
+    print(f"Extracted {len(messages)} messages")
+    print(f"Saved to: {output_file}")
+
+    return chat_data
 
 
 async def main():
@@ -144,37 +350,52 @@ async def main():
     if len(sys.argv) > 1:
         urls = sys.argv[1:]
 
+    # Screenshots and debug HTML cost an encode and a write per URL; opt in
+    debug = os.environ.get('GEMINI_DEBUG') == '1'
+    # Try a plain GET before rendering each page in the browser
+    http_first = os.environ.get('GEMINI_HTTP_FIRST') == '1'
+
     print(f"Extracting chat history from {len(urls)} URL(s)...")
     print("=" * 60)
 
-    results = []
-    for url in urls:
+    async with async_playwright() as p:
+        # Launch once; each URL only gets a fresh context
+        browser = await launch_browser(p)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_URLS)
+
+        async def run(url):
+            async with semaphore:
+                try:
+                    result = await extract_gemini_chat(browser, url, debug=debug, http_first=http_first)
+                except Exception as e:
+                    print(f"Error processing {url}: {e}")
+                    import traceback
+                    traceback.print_exc()
+                    result = {"error": str(e), "url": url}
+                print("=" * 60)
+                return result
+
         try:
-            result = await extract_gemini_chat(url)
-            results.append(result)
-            print("=" * 60)
-        except Exception as e:
-            print(f"Error processing {url}: {e}")
-            import traceback
-            traceback.print_exc()
-            results.append({"error": str(e), "url": url})
-            print("=" * 60)
+            # Extract all URLs concurrently (bounded by the semaphore)
+            results = await asyncio.gather(*(run(url) for url in urls))
+        finally:
+            await browser.close()
 
     # Save summary
     output_path = Path("output")
     output_path.mkdir(parents=True, exist_ok=True)
 
-    summary_file = output_path / f"extraction_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'timestamp': datetime.now().isoformat(),
-            'total_urls': len(urls),
-            'results': results
-        }, f, indent=2, ensure_ascii=False)
+    finished_at = datetime.now()
+    summary_file = output_path / f"extraction_summary_{finished_at.strftime('%Y%m%d_%H%M%S')}.json.gz"
+    await dump_summary({
+        'timestamp': finished_at.isoformat(),
+        'total_urls': len(urls),
+        'results': results
+    }, summary_file)
 
     print(f"\nSummary saved to: {summary_file}")
     print(f"\nProcessed {len(urls)} URL(s)!")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
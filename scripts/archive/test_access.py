@@ -6,20 +6,16 @@ import asyncio
 from patchright.async_api import async_playwright
 
 
-async def test_url(url):
+async def test_url(url, browser):
     print(f"\nTesting: {url}")
     print("=" * 60)
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-setuid-sandbox']
-        )
-
-        context = await browser.new_context(
-            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        )
+    # Each URL gets a fresh context; the browser is shared
+    context = await browser.new_context(
+        user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+    )
 
+    try:
         page = await context.new_page()
 
         # Go to page
@@ -28,25 +24,24 @@ async def test_url(url):
         print(f"Status: {response.status}")
         print(f"URL after redirects: {page.url}")
 
-        # Wait a bit
-        await asyncio.sleep(2)
-
-        # Try to get content
+        # Try to get content. The raw response is enough to tell whether the
+        # URL is reachable, so skip re-serializing the rendered DOM
         try:
-            content = await page.content()
-            print(f"HTML length: {len(content)} bytes")
-            print(f"HTML preview (first 500 chars):")
-            print(content[:500])
+            body = await response.body()
+            print(f"HTML length: {len(body)} bytes")
+            print("HTML preview (first 500 bytes):")
+            print(body[:500].decode('utf-8', 'replace'))
 
             # Save it
-            with open(f'test_output_{url.split("/")[-1]}.html', 'w') as f:
-                f.write(content)
+            with open(f'test_output_{url.split("/")[-1]}.html', 'wb') as f:
+                f.write(body)
                 print(f"\nSaved to: test_output_{url.split('/')[-1]}.html")
 
         except Exception as e:
             print(f"Error getting content: {e}")
 
-        await browser.close()
+    finally:
+        await context.close()
 
 
 async def main():
@@ -55,8 +50,18 @@ async def main():
         "https://g.co/gemini/share/4079b2f26c6f"
     ]
 
-    for url in urls:
-        await test_url(url)
+    async with async_playwright() as p:
+        # Launch once for all URLs
+        browser = await p.chromium.launch(
+            headless=True,
+            args=['--no-sandbox', '--disable-setuid-sandbox']
+        )
+
+        try:
+            for url in urls:
+                await test_url(url, browser)
+        finally:
+            await browser.close()
 
 
 if __name__ == "__main__":
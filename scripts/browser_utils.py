@@ -0,0 +1,193 @@
+"""
+Shared helpers for the chat extractors (extract_claude.py, extract_gemini.py
+and the scripts in archive/).
+
+The extractors are run as scripts from this directory, so they import this
+module as a sibling: `from browser_utils import ...`.
+"""
+
+import asyncio
+import gzip
+from urllib.parse import urlsplit
+import aiofiles
+import orjson
+
+# Maximum number of share pages extracted at the same time
+MAX_CONCURRENT_URLS = 4
+
+# Browser user agent, also sent by plain HTTP fetches
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+
+# Resource types that text extraction never needs
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+
+# Analytics/telemetry hosts whose beacons keep the network busy
+BLOCKED_HOSTS = (
+    "segment.io",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "sentry.io",
+    "statsig.com",
+    "cloudflareinsights.com",
+    "datadoghq.com",
+)
+
+# orjson options for every JSON artifact (pretty-printed, UTF-8 bytes)
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Write buffer for output files, so large artifacts go out in few syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Scrolls to the bottom until the page stops growing. Each step polls for new
+# content for up to settleMs instead of sleeping a fixed interval.
+SCROLL_TO_END_JS = """
+async ({ maxScrolls, settleMs }) => {
+    const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+    let height = document.body.scrollHeight;
+    let scrolls = 0;
+    while (scrolls < maxScrolls) {
+        window.scrollTo(0, document.body.scrollHeight);
+        const deadline = Date.now() + settleMs;
+        while (document.body.scrollHeight <= height && Date.now() < deadline) {
+            await sleep(100);
+        }
+        if (document.body.scrollHeight <= height) break;
+        height = document.body.scrollHeight;
+        scrolls++;
+    }
+    return { height, scrolls };
+}
+"""
+
+
+async def launch_browser(p, cdp_endpoint: str = None):
+    """Launch the Chromium instance shared by every extraction.
+
+    If cdp_endpoint is given (e.g. http://localhost:9222, see
+    start_browser.sh), connect to that long-running Chromium instead of
+    starting a new one. Closing a connected browser only drops our contexts
+    and disconnects; the remote Chromium keeps running.
+    """
+    if cdp_endpoint:
+        return await p.chromium.connect_over_cdp(cdp_endpoint)
+
+    return await p.chromium.launch(
+        headless=True,  # Run in headless mode for stability
+        args=[
+            "--no-sandbox",
+            "--disable-setuid-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-blink-features=AutomationControlled",
+            "--disable-web-security",
+        ],
+    )
+
+
+def is_telemetry_request(request) -> bool:
+    """Check whether a request goes to a known analytics/telemetry host."""
+    host = urlsplit(request.url).hostname or ""
+    # Match whole domain labels so e.g. notsentry.io is not blocked
+    return any(
+        host == blocked or host.endswith("." + blocked) for blocked in BLOCKED_HOSTS
+    )
+
+
+async def block_telemetry(route):
+    """Abort telemetry requests; let everything else through."""
+    if is_telemetry_request(route.request):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def block_heavy_resources(route):
+    """Abort telemetry plus images, fonts, media and stylesheets."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or is_telemetry_request(request):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def new_context(browser, block_resources: bool = True):
+    """Create the context every page of a run is opened in.
+
+    Sharing one context lets Chromium's HTTP cache serve the share page's
+    scripts to every URL after the first, instead of each URL downloading
+    them into a fresh context.
+    """
+    context = await browser.new_context(
+        viewport={"width": 1920, "height": 1080},
+        user_agent=USER_AGENT,
+        ignore_https_errors=True,
+        java_script_enabled=True,
+        bypass_csp=True,
+    )
+    if block_resources:
+        # Skip rendering-only downloads; pass block_resources=False for
+        # full-fidelity screenshots
+        await context.route("**/*", block_heavy_resources)
+    else:
+        # Telemetry is never needed, even for screenshots
+        await context.route("**/*", block_telemetry)
+    return context
+
+
+def extract_links(node) -> list:
+    """Collect {text, url} for every anchor with a non-empty href and text."""
+    return [
+        {"text": link_text, "url": href}
+        for link in node.css("a[href]")
+        if (href := link.attributes.get("href"))
+        and (link_text := link.text(strip=True, skip_empty=True))
+    ]
+
+
+async def dump_json(obj, path) -> None:
+    """Write obj to path as indented UTF-8 JSON without blocking the event loop."""
+    async with aiofiles.open(path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        await f.write(orjson.dumps(obj, option=JSON_OPTIONS))
+
+
+async def dump_html(html: str, path) -> None:
+    """Write html to path gzipped, without blocking the event loop."""
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(gzip.compress(html.encode("utf-8"), compresslevel=1))
+
+
+async def dump_summary(summary: dict, path) -> None:
+    """Write the run summary to path gzipped, without blocking the event loop."""
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(
+            gzip.compress(orjson.dumps(summary, option=JSON_OPTIONS), compresslevel=1)
+        )
+
+
+def summarize_result(url: str, result: dict) -> dict:
+    """Reduce an extraction result to the metadata kept in the run summary.
+
+    The per-URL chat JSON is the canonical output; the summary only points at
+    it, so its size does not grow with the transcripts.
+    """
+    entry = {
+        "url": url,
+        "status_code": result.get("status_code"),
+        "message_count": result.get("message_count"),
+    }
+    if "error" in result:
+        entry["error"] = result["error"]
+    else:
+        entry["json_file"] = result.get("json_file")
+    return entry
+
+
+def run_async(main):
+    """Run the main() coroutine, on uvloop when it is installed.
+
+    uvloop is a faster drop-in event loop; it is not available on Windows.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(main)
+    return uvloop.run(main)
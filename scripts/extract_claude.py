@@ -11,329 +11,348 @@ SETUP INSTRUCTIONS:
 
 2. Run the script:
    $ uv run python scripts/extract_claude.py [URL1] [URL2] ...
+   Add --screenshot (or set CLAUDE_EXTRACTOR_SCREENSHOT=1) to also save a JPEG
+   screenshot of each page.
+
+3. Optional: reuse one Chromium across many runs (e.g. repeated API calls)
+   $ scripts/start_browser.sh &
+   $ export CLAUDE_EXTRACTOR_CDP=http://localhost:9222
 
 TECHNICAL DETAILS:
 - Uses Patchright (patched Playwright) to avoid detection
 - Scrolls page to load all content (lazy-loaded messages)
 - Extracts structured data: user queries + assistant responses
 - Preserves markdown formatting in responses
-- Saves: JSON (structured data), HTML (raw page), PNG (screenshot)
+- Saves: JSON (structured data), gzipped HTML (raw page), JPEG (screenshot, opt-in)
 """
 
 import asyncio
-import json
+import os
 import sys
 from datetime import datetime
 from pathlib import Path
-from patchright.async_api import async_playwright
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+from patchright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from selectolax.lexbor import LexborHTMLParser
+from browser_utils import (
+    MAX_CONCURRENT_URLS,
+    SCROLL_TO_END_JS,
+    dump_html,
+    dump_json,
+    dump_summary,
+    extract_links,
+    launch_browser,
+    new_context,
+    run_async,
+    summarize_result,
+)
+
+
+def parse_messages(html: str) -> tuple:
+    """Build user/assistant messages from the scrolled page HTML.
+
+    Returns (messages, log_lines).
+    """
+    tree = LexborHTMLParser(html)
+
+    # Extract messages - Parse Claude conversation structure
+    messages = []
+    turn_idx = 0
+    # Log output, written in one go by the caller: this runs in a worker
+    # thread, so it must not print
+    log_lines = []
+    seen_contents = set()  # O(1) duplicate checks instead of rescanning messages
+
+    # Scope every query to the conversation root so the page chrome,
+    # scripts and styles are never walked (lexbor always provides a body)
+    main_content = tree.css_first('main') or tree.css_first('article') or tree.css_first('#root') or tree.body
+
+    # Claude's shared chat pages use a specific structure
+    # Look for message containers - Claude uses specific selectors
+
+    # Strategy 1: Find messages by looking for common Claude DOM patterns
+    # Claude share pages typically have message elements with specific attributes
+
+    # Try to find all text content blocks that could be messages
+    # Look for elements with 'font-user-message' or 'font-claude-message' classes
+    user_messages = main_content.css('[class*="font-user-message"]')
+    assistant_messages = main_content.css('[class*="font-claude-message"]')
+
+    log_lines.append(f"→ Found {len(user_messages)} user message elements")
+    log_lines.append(f"→ Found {len(assistant_messages)} assistant message elements")
+
+    # Strategy 2: Use semantic HTML structure
+    # Look for elements that represent conversation turns
+    if main_content:
+        # Find direct children that might be message containers
+        # This works for many chat interfaces
+        potential_containers = [child for child in main_content.iter() if child.tag in ('div', 'section', 'article')]
+
+        for container in potential_containers:
+            # Look for nested elements that might contain actual messages
+            # (css() also matches the container itself, so drop it)
+            nested_divs = [div for div in container.css('div') if div != container]
+
+            for div in nested_divs:
+                text = div.text(separator='\n', strip=True, skip_empty=True)
+
+                # Only process if it has meaningful content
+                if not text or len(text) < 10:
+                    continue
 
+                # Check if this looks like a distinct message
+                # (not just a container with lots of nested content)
+                # Children are listed once and only their text lengths are
+                # summed (the same length ' '.join would produce, without
+                # building the joined string)
+                children = list(div.iter())
+                if children:
+                    child_text_len = sum(len(child.text(strip=True, skip_empty=True)) for child in children) + len(children) - 1
+                    if child_text_len > len(text) * 0.8:
+                        # This is mostly a container, skip it
+                        continue
 
-async def extract_claude_chat(url: str, output_dir: str = "output") -> dict:
-    """Extract chat history from Claude share URL."""
-    print(f"\n{'=' * 60}")
-    print(f"Extracting: {url}")
-    print(f"{'=' * 60}\n")
+                # Avoid duplicates (before any markdown/link work)
+                if text in seen_contents:
+                    continue
 
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+                # Try to determine role based on structure
+                # (This is a heuristic approach for when specific selectors don't work)
+                # Alternate between user and assistant
+                # Start with user (most chats start with user input)
+                if len(messages) == 0:
+                    role = 'user'
+                else:
+                    # Alternate role from previous message
+                    role = 'assistant' if messages[-1]['role'] == 'user' else 'user'
+
+                # Create message
+                msg = {
+                    'index': len(messages),
+                    'turn': turn_idx,
+                    'role': role,
+                    'content': text,
+                }
+
+                # For assistant messages, add markdown and links
+                if role == 'assistant':
+                    # Serialized once here, converted in the post-pass below
+                    msg['_html'] = div.html
+
+                    # Extract links
+                    links = extract_links(div)
+                    if links:
+                        msg['links'] = links
+
+                seen_contents.add(text)
+                messages.append(msg)
+                log_lines.append(f"  Turn {turn_idx} - {role.capitalize()}: {text[:80]}...")
+
+                if role == 'assistant':
+                    turn_idx += 1
+
+    # If we didn't find messages with the above strategies, try a simpler approach
+    # Just extract all significant text blocks
+    if len(messages) == 0:
+        log_lines.append("→ Using fallback extraction method")
+        # Last resort: scan the whole document, not just main_content, in
+        # case the root picked above is empty or unrelated. The root itself
+        # is skipped; its text is every turn joined together
+        all_text_elements = [elem for elem in tree.css('p, div, span') if elem != main_content]
+
+        current_role = 'user'
+        for elem in all_text_elements:
+            text = elem.text(separator='\n', strip=True, skip_empty=True)
+
+            if not text or len(text) < 20:
+                continue
+
+            # Avoid duplicates
+            if text in seen_contents:
+                continue
+            seen_contents.add(text)
+
+            msg = {
+                'index': len(messages),
+                'turn': turn_idx if current_role == 'user' else turn_idx,
+                'role': current_role,
+                'content': text,
+            }
 
-    async with async_playwright() as p:
-        # Launch browser
-        browser = await p.chromium.launch(
-            headless=True,  # Run in headless mode for stability
-            args=[
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-blink-features=AutomationControlled",
-                "--disable-web-security",
-            ],
-        )
+            if current_role == 'assistant':
+                msg['_html'] = elem.html
 
-        # Create context
-        context = await browser.new_context(
-            viewport={"width": 1920, "height": 1080},
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            ignore_https_errors=True,
-        )
+            messages.append(msg)
+            log_lines.append(f"  {current_role.capitalize()}: {text[:60]}...")
 
-        page = await context.new_page()
+            # Alternate roles
+            if current_role == 'user':
+                current_role = 'assistant'
+            else:
+                current_role = 'user'
+                turn_idx += 1
 
-        try:
-            print(f"→ Loading page...")
-            response = await page.goto(
-                url, wait_until="domcontentloaded", timeout=30000
-            )
+            # Limit to reasonable number of messages
+            if len(messages) >= 50:
+                break
 
-            print(f"→ Status: {response.status}")
-            print(f"→ Waiting for content to load...")
+    # Convert assistant HTML to markdown once roles are final. markdownify
+    # is imported only when there is something to convert.
+    pending_markdown = [msg for msg in messages if '_html' in msg]
+    if pending_markdown:
+        from markdownify import MarkdownConverter
 
-            # Wait for page to fully load
-            await asyncio.sleep(5)
+        # One converter for the whole page keeps its per-tag handler cache warm
+        converter = MarkdownConverter(heading_style='ATX', bs4_options='lxml')
+        for msg in pending_markdown:
+            msg['content_markdown'] = converter.convert(msg.pop('_html')).strip()
 
-            # Get page content
-            html = await page.content()
-            print(f"→ HTML size: {len(html):,} bytes")
+    return messages, log_lines
 
-            # Save raw HTML for inspection
-            url_hash = url.split("/")[-1]
-            html_file = output_path / f"{url_hash}_raw.html"
-            with open(html_file, "w", encoding="utf-8") as f:
-                f.write(html)
-            print(f"→ Saved HTML: {html_file}")
 
-            # Take screenshot
-            screenshot_file = output_path / f"{url_hash}_screenshot.png"
-            await page.screenshot(path=str(screenshot_file), full_page=True)
-            print(f"→ Saved screenshot: {screenshot_file}")
+async def extract_claude_chat(
+    context,
+    url: str,
+    output_dir: str = "output",
+    take_screenshot: bool = False,
+) -> dict:
+    """Extract chat history from Claude share URL (one page in context)."""
+    print(f"\n{'=' * 60}")
+    print(f"Extracting: {url}")
+    print(f"{'=' * 60}\n")
 
-            # Parse HTML
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Extract title
-            title = soup.find("title")
-            page_title = title.text if title else "No title"
-            print(f"→ Page title: {page_title}")
-
-            # Scroll to bottom to load all messages (lazy-loaded content)
-            print(f"→ Scrolling to load all content...")
-            last_height = await page.evaluate("document.body.scrollHeight")
-            scroll_attempts = 0
-            max_scrolls = 15  # Increased for potentially long conversations
-
-            while scroll_attempts < max_scrolls:
-                # Scroll to bottom
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(1.5)  # Wait for content to load
-
-                # Check if new content loaded
-                new_height = await page.evaluate("document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-                scroll_attempts += 1
-                print(f"  Scroll #{scroll_attempts}: height={new_height}px")
-
-            print(f"→ Scrolling complete after {scroll_attempts} attempts")
-
-            # Get updated HTML after scrolling
-            html = await page.content()
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Extract messages - Parse Claude conversation structure
-            messages = []
-            turn_idx = 0
-
-            # Claude's shared chat pages use a specific structure
-            # Look for message containers - Claude uses specific selectors
-
-            # Strategy 1: Find messages by looking for common Claude DOM patterns
-            # Claude share pages typically have message elements with specific attributes
-
-            # Try to find all text content blocks that could be messages
-            # Look for elements with 'font-user-message' or 'font-claude-message' classes
-            user_messages = soup.find_all(class_=lambda x: x and 'font-user-message' in str(x))
-            assistant_messages = soup.find_all(class_=lambda x: x and 'font-claude-message' in str(x))
-
-            print(f"→ Found {len(user_messages)} user message elements")
-            print(f"→ Found {len(assistant_messages)} assistant message elements")
-
-            # Strategy 2: Look for alternating message pattern in the DOM
-            # Find all potential message blocks
-            message_blocks = []
-
-            # Find all divs that might contain messages
-            # Claude often uses divs with specific data attributes or classes
-            for div in soup.find_all(['div', 'article']):
-                # Check if this div contains substantial text
-                text = div.get_text(separator=' ', strip=True)
-                if len(text) < 20:  # Skip short texts
-                    continue
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
 
-                # Check if it might be a message by looking for indicators
-                classes = div.get('class', [])
-                class_str = ' '.join(classes) if classes else ''
-
-                # Look for message-like content
-                if any(indicator in text.lower()[:100] for indicator in ['hello', 'hi ', 'please', 'what', 'how', 'can you', 'i need', 'help']):
-                    # This might be a user message
-                    message_blocks.append({
-                        'element': div,
-                        'text': text,
-                        'classes': class_str,
-                        'likely_role': 'user'
-                    })
-                elif len(text) > 100:  # Longer texts might be assistant responses
-                    message_blocks.append({
-                        'element': div,
-                        'text': text,
-                        'classes': class_str,
-                        'likely_role': 'assistant'
-                    })
-
-            # Strategy 3: Use semantic HTML structure
-            # Look for elements that represent conversation turns
-            main_content = soup.find('main') or soup.find('article') or soup.find(id='root') or soup.body
-
-            if main_content:
-                # Find direct children that might be message containers
-                # This works for many chat interfaces
-                potential_containers = main_content.find_all(['div', 'section', 'article'], recursive=False)
-
-                for container in potential_containers:
-                    # Look for nested elements that might contain actual messages
-                    nested_divs = container.find_all('div', recursive=True)
-
-                    for div in nested_divs:
-                        text = div.get_text(separator='\n', strip=True)
-
-                        # Only process if it has meaningful content
-                        if not text or len(text) < 10:
-                            continue
-
-                        # Check if this looks like a distinct message
-                        # (not just a container with lots of nested content)
-                        child_texts = [child.get_text(strip=True) for child in div.find_all(recursive=False) if child.name]
-                        if child_texts and len(' '.join(child_texts)) > len(text) * 0.8:
-                            # This is mostly a container, skip it
-                            continue
-
-                        # Try to determine role based on content and structure
-                        # (This is a heuristic approach for when specific selectors don't work)
-                        is_code_heavy = len(div.find_all(['pre', 'code'])) > 0
-                        is_long = len(text) > 150
-
-                        # Alternate between user and assistant
-                        # Start with user (most chats start with user input)
-                        if len(messages) == 0:
-                            role = 'user'
-                        else:
-                            # Alternate role from previous message
-                            role = 'assistant' if messages[-1]['role'] == 'user' else 'user'
-
-                        # Create message
-                        msg = {
-                            'index': len(messages),
-                            'turn': turn_idx,
-                            'role': role,
-                            'content': text,
-                        }
-
-                        # For assistant messages, add markdown and links
-                        if role == 'assistant':
-                            content_markdown = md(str(div), heading_style='ATX').strip()
-                            msg['content_markdown'] = content_markdown
-
-                            # Extract links
-                            links = []
-                            for link in div.find_all('a', href=True):
-                                link_text = link.get_text(strip=True)
-                                href = link['href']
-                                if link_text and href:
-                                    links.append({'text': link_text, 'url': href})
-                            if links:
-                                msg['links'] = links
-
-                        # Avoid duplicates
-                        if not any(m['content'] == text for m in messages):
-                            messages.append(msg)
-                            print(f"  Turn {turn_idx} - {role.capitalize()}: {text[:80]}...")
-
-                            if role == 'assistant':
-                                turn_idx += 1
-
-            # If we didn't find messages with the above strategies, try a simpler approach
-            # Just extract all significant text blocks
-            if len(messages) == 0:
-                print("→ Using fallback extraction method")
-                all_text_elements = soup.find_all(['p', 'div', 'span'])
+    page = await context.new_page()
+    # Bound every wait so one stuck page cannot hold a concurrency slot forever
+    page.set_default_timeout(15000)
+    page.set_default_navigation_timeout(20000)
 
-                current_role = 'user'
-                for elem in all_text_elements:
-                    text = elem.get_text(separator='\n', strip=True)
+    try:
+        print(f"→ Loading page...")
+        response = await page.goto(
+            url, wait_until="domcontentloaded", timeout=30000
+        )
 
-                    if not text or len(text) < 20:
-                        continue
+        status = response.status if response else None
+        print(f"→ Status: {status}")
 
-                    # Avoid duplicates
-                    if any(m['content'] == text for m in messages):
-                        continue
+        # Error pages have no conversation; skip waiting, scrolling and parsing
+        if status is None or status >= 400:
+            print(f"\n✗ ERROR: HTTP {status}")
+            return {"error": f"HTTP {status}", "url": url, "status_code": status}
 
-                    msg = {
-                        'index': len(messages),
-                        'turn': turn_idx if current_role == 'user' else turn_idx,
-                        'role': current_role,
-                        'content': text,
-                    }
-
-                    if current_role == 'assistant':
-                        msg['content_markdown'] = md(str(elem), heading_style='ATX').strip()
-
-                    messages.append(msg)
-                    print(f"  {current_role.capitalize()}: {text[:60]}...")
-
-                    # Alternate roles
-                    if current_role == 'user':
-                        current_role = 'assistant'
-                    else:
-                        current_role = 'user'
-                        turn_idx += 1
-
-                    # Limit to reasonable number of messages
-                    if len(messages) >= 50:
-                        break
-
-            print(f"→ Extracted {len(messages)} messages")
-
-            # Create output data
-            chat_data = {
-                "url": url,
-                "timestamp": datetime.now().isoformat(),
-                "page_title": page_title,
-                "status_code": response.status,
-                "message_count": len(messages),
-                "messages": messages,
-            }
+        print(f"→ Waiting for content to load...")
 
-            # Save JSON
-            json_file = output_path / f"{url_hash}_chat.json"
-            with open(json_file, "w", encoding="utf-8") as f:
-                json.dump(chat_data, f, indent=2, ensure_ascii=False)
-            print(f"→ Saved JSON: {json_file}")
-
-            # Print summary
-            print(f"\n{'=' * 60}")
-            print(f"✓ SUCCESS")
-            print(f"  Messages extracted: {len(messages)}")
-            print(f"  Output files:")
-            print(f"    - {json_file}")
-            print(f"    - {html_file}")
+        # Wait until the first message is in the DOM instead of a fixed delay
+        try:
+            await page.wait_for_selector(
+                '[class*="font-claude-message"], [class*="font-user-message"]',
+                state="attached",
+                timeout=15000,
+            )
+        except PlaywrightTimeoutError:
+            print("→ No message elements after 15s, continuing anyway")
+
+        url_hash = url.split("/")[-1]
+
+        # Take screenshot (opt-in: a full-page capture costs seconds per URL).
+        # JPEG encodes far faster than PNG on long pages.
+        screenshot_file = None
+        if take_screenshot:
+            screenshot_file = output_path / f"{url_hash}_screenshot.jpg"
+            await page.screenshot(
+                path=str(screenshot_file), full_page=True, type="jpeg", quality=70
+            )
+            print(f"→ Saved screenshot: {screenshot_file}")
+
+        # Extract title (Playwright already has it; no need to parse the page)
+        page_title = await page.title() or "No title"
+        print(f"→ Page title: {page_title}")
+
+        # Scroll to bottom to load all messages (lazy-loaded content)
+        print(f"→ Scrolling to load all content...")
+        max_scrolls = 15  # Increased for potentially long conversations
+        # The whole loop runs in the page, so it costs one CDP round-trip
+        scroll = await page.evaluate(
+            SCROLL_TO_END_JS, {"maxScrolls": max_scrolls, "settleMs": 1500}
+        )
+        print(f"→ Scrolling complete after {scroll['scrolls']} attempts (height={scroll['height']}px)")
+
+        # Serialize the page once, after scrolling, for both the dump and parsing
+        html = await page.content()
+        print(f"→ HTML size: {len(html):,} bytes")
+
+        # Save raw HTML for inspection
+        html_file = output_path / f"{url_hash}_raw.html.gz"
+        await dump_html(html, html_file)
+        print(f"→ Saved HTML (gzip): {html_file}")
+
+        # Parsing and markdown conversion are CPU-bound; run them on a worker
+        # thread so concurrent extractions keep making progress meanwhile
+        messages, log_lines = await asyncio.to_thread(parse_messages, html)
+
+        if log_lines:
+            sys.stdout.write("\n".join(log_lines) + "\n")
+        print(f"→ Extracted {len(messages)} messages")
+
+        # Create output data
+        chat_data = {
+            "url": url,
+            "timestamp": datetime.now().isoformat(),
+            "page_title": page_title,
+            "status_code": response.status,
+            "message_count": len(messages),
+            "messages": messages,
+        }
+
+        # Save JSON
+        json_file = output_path / f"{url_hash}_chat.json"
+        await dump_json(chat_data, json_file)
+        print(f"→ Saved JSON: {json_file}")
+        # Where the chat was written, for the run summary
+        chat_data["json_file"] = str(json_file)
+
+        # Print summary
+        print(f"\n{'=' * 60}")
+        print(f"✓ SUCCESS")
+        print(f"  Messages extracted: {len(messages)}")
+        print(f"  Output files:")
+        print(f"    - {json_file}")
+        print(f"    - {html_file}")
+        if screenshot_file:
             print(f"    - {screenshot_file}")
-            print(f"{'=' * 60}\n")
+        print(f"{'=' * 60}\n")
 
-            return chat_data
+        return chat_data
 
-        except Exception as e:
-            print(f"\n✗ ERROR: {e}")
-            import traceback
+    except Exception as e:
+        print(f"\n✗ ERROR: {e}")
+        import traceback
 
-            traceback.print_exc()
-            return {"error": str(e), "url": url}
+        traceback.print_exc()
+        return {"error": str(e), "url": url}
 
-        finally:
-            await browser.close()
+    finally:
+        await page.close()
 
 
 async def main():
     """Main function."""
 
+    args = sys.argv[1:]
+    take_screenshot = (
+        "--screenshot" in args or os.environ.get("CLAUDE_EXTRACTOR_SCREENSHOT") == "1"
+    )
+    args = [arg for arg in args if arg != "--screenshot"]
+    # Screenshots need stylesheets and images to look right
+    block_resources = not take_screenshot
+
     # Check for API mode (single URL + output file specified)
-    if len(sys.argv) == 3:
+    if len(args) == 2:
         # API mode: extract_claude.py <URL> <output_file>
-        url = sys.argv[1]
-        output_file = sys.argv[2]
+        url = args[0]
+        output_file = args[1]
 
         print("\n" + "=" * 60)
         print("CLAUDE CHAT EXTRACTOR - API MODE")
@@ -342,21 +361,27 @@ async def main():
         print(f"Output: {output_file}")
 
         # Extract to temporary directory
-        result = await extract_claude_chat(url, output_dir="output")
+        async with async_playwright() as p:
+            browser = await launch_browser(p, os.environ.get("CLAUDE_EXTRACTOR_CDP"))
+            try:
+                context = await new_context(browser, block_resources)
+                result = await extract_claude_chat(
+                    context, url, output_dir="output", take_screenshot=take_screenshot
+                )
+            finally:
+                await browser.close()
 
         # Copy the result to the specified output file
         if "error" not in result:
             output_path = Path(output_file)
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
+            await dump_json(result, output_file)
             print(f"✓ Saved to: {output_file}\n")
         else:
             # Save error result
             output_path = Path(output_file)
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
+            await dump_json(result, output_file)
             print(f"✗ Error saved to: {output_file}\n")
 
         return
@@ -368,42 +393,61 @@ async def main():
     ]
 
     # Allow custom URLs from command line
-    if len(sys.argv) > 1:
-        urls = sys.argv[1:]
+    if args:
+        urls = args
 
     print("\n" + "=" * 60)
     print("CLAUDE CHAT EXTRACTOR")
     print("=" * 60)
     print(f"\nProcessing {len(urls)} URL(s)...")
 
-    results = []
-    for url in urls:
-        result = await extract_claude_chat(url)
-        results.append(result)
+    async with async_playwright() as p:
+        # Launch once and open every URL as a page in one shared context
+        browser = await launch_browser(p, os.environ.get("CLAUDE_EXTRACTOR_CDP"))
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_URLS)
+
+        async def run(url):
+            async with semaphore:
+                result = await extract_claude_chat(context, url, take_screenshot=take_screenshot)
+                # Keep only metadata so finished chats can be freed right away
+                return summarize_result(url, result)
+
+        try:
+            context = await new_context(browser, block_resources)
+            # Pages load and scroll concurrently, bounded by the semaphore
+            results = await asyncio.gather(
+                *(run(url) for url in urls), return_exceptions=True
+            )
+        finally:
+            await browser.close()
+
+    results = [
+        summarize_result(url, {"error": str(result)})
+        if isinstance(result, BaseException)
+        else result
+        for url, result in zip(urls, results)
+    ]
 
     # Save summary
     output_path = Path("output")
     output_path.mkdir(parents=True, exist_ok=True)
 
     summary_file = (
-        output_path / f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output_path / f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json.gz"
+    )
+    await dump_summary(
+        {
+            "timestamp": datetime.now().isoformat(),
+            "total_urls": len(urls),
+            "successful": sum(1 for r in results if "error" not in r),
+            "failed": sum(1 for r in results if "error" in r),
+            "results": results,
+        },
+        summary_file,
     )
-    with open(summary_file, "w", encoding="utf-8") as f:
-        json.dump(
-            {
-                "timestamp": datetime.now().isoformat(),
-                "total_urls": len(urls),
-                "successful": sum(1 for r in results if "error" not in r),
-                "failed": sum(1 for r in results if "error" in r),
-                "results": results,
-            },
-            f,
-            indent=2,
-            ensure_ascii=False,
-        )
 
-    print(f"\n✓ Summary saved: {summary_file}\n")
+    print(f"\n✓ Summary saved (gzip): {summary_file}\n")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
@@ -16,13 +16,18 @@ SETUP INSTRUCTIONS:
 
 2. Run the script:
    $ uv run python scripts/extract_gemini.py [URL1] [URL2] ...
+   Add --screenshot (or set GEMINI_EXTRACTOR_SCREENSHOT=1) to also save a JPEG
+   screenshot of each page, and --save-html (or GEMINI_EXTRACTOR_SAVE_HTML=1)
+   to keep the gzipped page HTML. --http-first (or GEMINI_EXTRACTOR_HTTP_FIRST=1)
+   tries a plain HTTP fetch before starting the browser, for share pages that
+   are served pre-rendered.
 
 TECHNICAL DETAILS:
 - Uses Patchright (patched Playwright) to avoid detection
 - Scrolls page to load all content (lazy-loaded turns)
 - Extracts structured data: user queries + assistant responses
 - Preserves markdown formatting in responses
-- Saves: JSON (structured data), HTML (raw page), PNG (screenshot)
+- Saves: JSON (structured data), gzipped HTML (raw page, opt-in), JPEG (screenshot, opt-in)
 
 RECENT CHANGES (2025-11-14):
 - Added automatic scrolling to load all conversation turns
@@ -35,17 +40,209 @@ RECENT CHANGES (2025-11-14):
 """
 
 import asyncio
-import json
+import os
 import sys
 from datetime import datetime
 from pathlib import Path
-from patchright.async_api import async_playwright
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+import aiohttp
+from patchright.async_api import (
+    async_playwright,
+    TimeoutError as PlaywrightTimeoutError,
+)
+from selectolax.lexbor import LexborHTMLParser
+from markdownify import MarkdownConverter
+from browser_utils import (
+    MAX_CONCURRENT_URLS,
+    SCROLL_TO_END_JS,
+    USER_AGENT,
+    dump_html,
+    dump_json,
+    dump_summary,
+    extract_links,
+    launch_browser,
+    new_context,
+    run_async,
+    summarize_result,
+)
+
+# One HTML-to-Markdown converter for every turn; reusing it keeps markdownify's
+# per-tag handler cache warm. lxml is the C-based parser for its re-parse.
+MARKDOWN_CONVERTER = MarkdownConverter(heading_style="ATX", bs4_options="lxml")
+
+
+def parse_messages(turn_html: list) -> tuple:
+    """Build user/assistant messages from share-turn-viewer outerHTML strings.
+
+    Returns (messages, log_lines).
+    """
+    tree = LexborHTMLParser("".join(turn_html))
+    messages = []
+    # Log output, written in one go by the caller: this runs in a worker
+    # thread, so it must not print
+    log_lines = []
+
+    # Find all conversation turns (share-turn-viewer elements)
+    turn_viewers = tree.css("share-turn-viewer")
+    log_lines.append(f"→ Found {len(turn_viewers)} conversation turns")
+
+    for turn_idx, turn in enumerate(turn_viewers):
+        # Extract user query (one descendant selector per role)
+        query_text_elem = turn.css_first("user-query div.query-text")
+        if query_text_elem:
+            query_text = query_text_elem.text(
+                separator="\n", strip=True, skip_empty=True
+            )
+            if query_text:
+                messages.append(
+                    {
+                        "index": len(messages),
+                        "turn": turn_idx,
+                        "role": "user",
+                        "content": query_text,
+                    }
+                )
+                log_lines.append(f"  Turn {turn_idx} - User: {query_text[:80]}...")
+
+        # Extract assistant response from its markdown div
+        markdown_div = turn.css_first("message-content div.markdown")
+        if markdown_div:
+            # Convert HTML to markdown (preserves links and formatting)
+            response_markdown = MARKDOWN_CONVERTER.convert(markdown_div.html)
+
+            # Also extract plain text for backward compatibility
+            response_text = markdown_div.text(
+                separator="\n", strip=True, skip_empty=True
+            )
+
+            # Extract hyperlinks separately for reference. Read them from the
+            # DOM, not the markdown: markdownify escapes _ and * in link text,
+            # appends titles after the URL and emits images as ![alt](src)
+            links = extract_links(markdown_div)
+
+            if response_markdown:
+                msg = {
+                    "index": len(messages),
+                    "turn": turn_idx,
+                    "role": "assistant",
+                    "content": response_text,  # Plain text for backward compatibility
+                    "content_markdown": response_markdown.strip(),  # Markdown with links preserved
+                }
+                if links:
+                    msg["links"] = links  # Separate links array for easy reference
+                messages.append(msg)
+                link_count = len(links)
+                log_lines.append(
+                    f"  Turn {turn_idx} - Assistant: {response_text[:80]}... [{link_count} links]"
+                )
+
+    return messages, log_lines
+
+
+async def save_chat(
+    url: str,
+    output_path: Path,
+    status: int,
+    page_title: str,
+    turn_html: list,
+    html_file=None,
+    screenshot_file=None,
+) -> dict:
+    """Parse the turns, save {url_hash}_chat.json and print a run summary."""
+    # Parsing and markdown conversion are CPU-bound; run them on a worker
+    # thread so concurrent extractions keep making progress meanwhile
+    messages, log_lines = await asyncio.to_thread(parse_messages, turn_html)
+
+    if log_lines:
+        sys.stdout.write("\n".join(log_lines) + "\n")
+    print(f"→ Extracted {len(messages)} messages from {len(turn_html)} turns")
+
+    # Create output data
+    chat_data = {
+        "url": url,
+        "timestamp": datetime.now().isoformat(),
+        "page_title": page_title,
+        "status_code": status,
+        "message_count": len(messages),
+        "messages": messages,
+    }
+
+    # Save JSON
+    url_hash = url.split("/")[-1]
+    json_file = output_path / f"{url_hash}_chat.json"
+    await dump_json(chat_data, json_file)
+    print(f"→ Saved JSON: {json_file}")
+    # Where the chat was written, for the run summary
+    chat_data["json_file"] = str(json_file)
+
+    # Print summary
+    print(f"\n{'=' * 60}")
+    print(f"✓ SUCCESS")
+    print(f"  Messages extracted: {len(messages)}")
+    print(f"  Output files:")
+    print(f"    - {json_file}")
+    if html_file:
+        print(f"    - {html_file}")
+    if screenshot_file:
+        print(f"    - {screenshot_file}")
+    print(f"{'=' * 60}\n")
 
+    return chat_data
+
+
+async def fetch_turns_over_http(url: str):
+    """Fetch a share page without a browser.
+
+    Returns (status, page_title, turn_html) when the served HTML already
+    contains share-turn-viewer elements, otherwise None. Share pages are
+    normally rendered client-side, so callers must fall back to Playwright.
+    """
+    try:
+        async with aiohttp.ClientSession(
+            headers={"User-Agent": USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=15),
+        ) as session:
+            async with session.get(url) as response:
+                if response.status >= 400:
+                    return None
+                # Raw bytes: lexbor decodes them, so a bad or missing charset
+                # cannot fail the fetch and skip the browser fallback
+                html = await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+    tree = LexborHTMLParser(html)
+    turns = tree.css("share-turn-viewer")
+    if not turns:
+        return None
+    title = tree.css_first("title")
+    return (
+        response.status,
+        title.text() if title else "No title",
+        [t.html for t in turns],
+    )
 
-async def extract_gemini_chat(url: str, output_dir: str = "output") -> dict:
-    """Extract chat history from Gemini URL."""
+
+async def extract_over_http(url: str, output_path: Path):
+    """Try the plain-HTTP fast path; return the saved chat, or None to use the browser."""
+    fetched = await fetch_turns_over_http(url)
+    if not fetched:
+        print("→ No server-rendered turns, falling back to the browser")
+        return None
+    print("→ Turns served without JavaScript, skipping the browser")
+    status, page_title, turn_html = fetched
+    output_path.mkdir(parents=True, exist_ok=True)
+    return await save_chat(url, output_path, status, page_title, turn_html)
+
+
+async def extract_gemini_chat(
+    context,
+    url: str,
+    output_dir: str = "output",
+    take_screenshot: bool = False,
+    save_html: bool = False,
+    http_first: bool = False,
+) -> dict:
+    """Extract chat history from Gemini URL (one page in context)."""
     print(f"\n{'=' * 60}")
     print(f"Extracting: {url}")
     print(f"{'=' * 60}\n")
@@ -53,211 +250,134 @@ async def extract_gemini_chat(url: str, output_dir: str = "output") -> dict:
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    async with async_playwright() as p:
-        # Launch browser
-        # FIXED: Changed from headless=False to True to prevent manual browser closure issues
-        browser = await p.chromium.launch(
-            headless=True,  # Run in headless mode for stability
-            args=[
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-blink-features=AutomationControlled",
-                "--disable-web-security",
-            ],
-        )
-
-        # Create context
-        context = await browser.new_context(
-            viewport={"width": 1920, "height": 1080},
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            ignore_https_errors=True,
-        )
+    page = None
+    try:
+        # Try a plain HTTP fetch first; skip the browser if it has the turns
+        if http_first:
+            result = await extract_over_http(url, output_path)
+            if result:
+                return result
 
         page = await context.new_page()
+        # Bound every wait so one stuck page cannot hold a concurrency slot forever
+        page.set_default_timeout(15000)
+        page.set_default_navigation_timeout(20000)
 
-        try:
-            print(f"→ Loading page...")
-            # FIXED: Changed wait_until from 'networkidle' to 'domcontentloaded'
-            # Reason: 'networkidle' was timing out after 60s on Gemini share pages
-            # 'domcontentloaded' works better for dynamically loaded content
-            response = await page.goto(
-                url, wait_until="domcontentloaded", timeout=30000
-            )
-
-            print(f"→ Status: {response.status}")
-            print(f"→ Waiting for content to load...")
+        print(f"→ Loading page...")
+        # FIXED: Changed wait_until from 'networkidle' to 'domcontentloaded'
+        # Reason: 'networkidle' was timing out after 60s on Gemini share pages
+        # 'domcontentloaded' works better for dynamically loaded content
+        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
 
-            # Wait for page to fully load
-            await asyncio.sleep(5)
+        status = response.status if response else None
+        print(f"→ Status: {status}")
 
-            # Get page content
-            html = await page.content()
-            print(f"→ HTML size: {len(html):,} bytes")
+        # Error pages have no conversation; skip waiting, scrolling and parsing
+        if status is None or status >= 400:
+            print(f"\n✗ ERROR: HTTP {status}")
+            return {"error": f"HTTP {status}", "url": url, "status_code": status}
 
-            # Save raw HTML for inspection
-            url_hash = url.split("/")[-1]
-            html_file = output_path / f"{url_hash}_raw.html"
-            with open(html_file, "w", encoding="utf-8") as f:
-                f.write(html)
-            print(f"→ Saved HTML: {html_file}")
+        print(f"→ Waiting for content to load...")
 
-            # Take screenshot
-            screenshot_file = output_path / f"{url_hash}_screenshot.png"
-            await page.screenshot(path=str(screenshot_file), full_page=True)
+        # Wait until the first turn is in the DOM instead of a fixed delay
+        try:
+            await page.wait_for_selector(
+                "share-turn-viewer", state="attached", timeout=15000
+            )
+        except PlaywrightTimeoutError:
+            print("→ No conversation turns after 15s, continuing anyway")
+
+        url_hash = url.split("/")[-1]
+
+        # Take screenshot (opt-in: encoding and writing it costs more than the
+        # rest of the extraction). A viewport JPEG keeps it cheap when enabled.
+        screenshot_file = None
+        if take_screenshot:
+            screenshot_file = output_path / f"{url_hash}_screenshot.jpg"
+            await page.screenshot(
+                path=str(screenshot_file), full_page=False, type="jpeg", quality=70
+            )
             print(f"→ Saved screenshot: {screenshot_file}")
 
-            # Parse HTML
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Extract title
-            title = soup.find("title")
-            page_title = title.text if title else "No title"
-            print(f"→ Page title: {page_title}")
+        # Extract title (Playwright already has it; no need to parse the page)
+        page_title = await page.title() or "No title"
+        print(f"→ Page title: {page_title}")
+
+        # Scroll to bottom to load all messages (lazy-loaded content)
+        print(f"→ Scrolling to load all content...")
+        max_scrolls = 15  # Increased for potentially long conversations
+        # The whole loop runs in the page, so it costs one CDP round-trip;
+        # each step waits up to 2s for lazy-loaded turns to grow the page
+        scroll = await page.evaluate(
+            SCROLL_TO_END_JS, {"maxScrolls": max_scrolls, "settleMs": 2000}
+        )
+        print(
+            f"→ Scrolling complete after {scroll['scrolls']} attempts "
+            f"(height={scroll['height']}px)"
+        )
 
-            # Scroll to bottom to load all messages (lazy-loaded content)
-            print(f"→ Scrolling to load all content...")
-            last_height = await page.evaluate("document.body.scrollHeight")
-            scroll_attempts = 0
-            max_scrolls = 15  # Increased for potentially long conversations
+        # Pull only the conversation turns out of Chromium in one round trip;
+        # scripts, styles and the rest of the page never cross CDP
+        turn_html = await page.locator("share-turn-viewer").evaluate_all(
+            "turns => turns.map(turn => turn.outerHTML)"
+        )
 
-            while scroll_attempts < max_scrolls:
-                # Scroll to bottom
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(1.5)  # Wait for content to load
+        # Save raw HTML for inspection (opt-in: serializes the whole page)
+        html_file = None
+        if save_html:
+            html = await page.content()
+            print(f"→ HTML size: {len(html):,} bytes")
+            html_file = output_path / f"{url_hash}_raw.html.gz"
+            await dump_html(html, html_file)
+            print(f"→ Saved HTML (gzip): {html_file}")
 
-                # Check if new content loaded
-                new_height = await page.evaluate("document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-                scroll_attempts += 1
-                print(f"  Scroll #{scroll_attempts}: height={new_height}px")
+        return await save_chat(
+            url, output_path, status, page_title, turn_html, html_file, screenshot_file
+        )
 
-            print(f"→ Scrolling complete after {scroll_attempts} attempts")
+    except Exception as e:
+        print(f"\n✗ ERROR: {e}")
+        import traceback
 
-            # Get updated HTML after scrolling
-            html = await page.content()
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Extract messages - Parse conversation turns structure
-            messages = []
-
-            # Find all conversation turns (share-turn-viewer elements)
-            turn_viewers = soup.find_all("share-turn-viewer")
-            print(f"→ Found {len(turn_viewers)} conversation turns")
-
-            for turn_idx, turn in enumerate(turn_viewers):
-                # Extract user query
-                user_query = turn.find("user-query")
-                if user_query:
-                    query_text_elem = user_query.find("div", class_="query-text")
-                    if query_text_elem:
-                        query_text = query_text_elem.get_text(
-                            separator="\n", strip=True
-                        )
-                        if query_text:
-                            messages.append(
-                                {
-                                    "index": len(messages),
-                                    "turn": turn_idx,
-                                    "role": "user",
-                                    "content": query_text,
-                                }
-                            )
-                            print(f"  Turn {turn_idx} - User: {query_text[:80]}...")
-
-                # Extract assistant response
-                message_content = turn.find("message-content")
-                if message_content:
-                    # Get the markdown div
-                    markdown_div = message_content.find("div", class_="markdown")
-                    if markdown_div:
-                        # Convert HTML to markdown (preserves links and formatting)
-                        response_markdown = md(str(markdown_div), heading_style="ATX")
-
-                        # Also extract plain text for backward compatibility
-                        response_text = markdown_div.get_text(
-                            separator="\n", strip=True
-                        )
-
-                        # Extract hyperlinks separately for reference
-                        links = []
-                        for link in markdown_div.find_all("a", href=True):
-                            link_text = link.get_text(strip=True)
-                            href = link["href"]
-                            if link_text and href:
-                                links.append({"text": link_text, "url": href})
-
-                        if response_markdown:
-                            msg = {
-                                "index": len(messages),
-                                "turn": turn_idx,
-                                "role": "assistant",
-                                "content": response_text,  # Plain text for backward compatibility
-                                "content_markdown": response_markdown.strip(),  # Markdown with links preserved
-                            }
-                            if links:
-                                msg["links"] = (
-                                    links  # Separate links array for easy reference
-                                )
-                            messages.append(msg)
-                            link_count = len(links)
-                            print(
-                                f"  Turn {turn_idx} - Assistant: {response_text[:80]}... [{link_count} links]"
-                            )
-
-            print(
-                f"→ Extracted {len(messages)} messages from {len(turn_viewers)} turns"
-            )
+        traceback.print_exc()
+        return {"error": str(e), "url": url}
 
-            # Create output data
-            chat_data = {
-                "url": url,
-                "timestamp": datetime.now().isoformat(),
-                "page_title": page_title,
-                "status_code": response.status,
-                "message_count": len(messages),
-                "messages": messages,
-            }
-
-            # Save JSON
-            json_file = output_path / f"{url_hash}_chat.json"
-            with open(json_file, "w", encoding="utf-8") as f:
-                json.dump(chat_data, f, indent=2, ensure_ascii=False)
-            print(f"→ Saved JSON: {json_file}")
-
-            # Print summary
-            print(f"\n{'=' * 60}")
-            print(f"✓ SUCCESS")
-            print(f"  Messages extracted: {len(messages)}")
-            print(f"  Output files:")
-            print(f"    - {json_file}")
-            print(f"    - {html_file}")
-            print(f"    - {screenshot_file}")
-            print(f"{'=' * 60}\n")
-
-            return chat_data
-
-        except Exception as e:
-            print(f"\n✗ ERROR: {e}")
-            import traceback
-
-            traceback.print_exc()
-            return {"error": str(e), "url": url}
-
-        finally:
-            await browser.close()
+    finally:
+        if page:
+            await page.close()
 
 
 async def main():
     """Main function."""
 
+    args = sys.argv[1:]
+    take_screenshot = (
+        "--screenshot" in args or os.environ.get("GEMINI_EXTRACTOR_SCREENSHOT") == "1"
+    )
+    save_html = (
+        "--save-html" in args or os.environ.get("GEMINI_EXTRACTOR_SAVE_HTML") == "1"
+    )
+    http_first = (
+        "--http-first" in args or os.environ.get("GEMINI_EXTRACTOR_HTTP_FIRST") == "1"
+    )
+    args = [
+        arg
+        for arg in args
+        if arg not in ("--screenshot", "--save-html", "--http-first")
+    ]
+    # Screenshots need stylesheets and images to look right
+    block_resources = not take_screenshot
+    options = {
+        "take_screenshot": take_screenshot,
+        "save_html": save_html,
+        "http_first": http_first,
+    }
+
     # Check for API mode (single URL + output file specified)
-    if len(sys.argv) == 3:
+    if len(args) == 2:
         # API mode: extract_gemini.py <URL> <output_file>
-        url = sys.argv[1]
-        output_file = sys.argv[2]
+        url = args[0]
+        output_file = args[1]
 
         print("\n" + "=" * 60)
         print("GEMINI CHAT EXTRACTOR - API MODE")
@@ -265,22 +385,41 @@ async def main():
         print(f"URL: {url}")
         print(f"Output: {output_file}")
 
+        # Try the fast path before paying for a browser launch
+        result = None
+        if http_first:
+            try:
+                result = await extract_over_http(url, Path("output"))
+            except Exception as e:
+                print(f"\n✗ ERROR: {e}")
+                result = {"error": str(e), "url": url}
+
         # Extract to temporary directory
-        result = await extract_gemini_chat(url, output_dir="output")
+        if result is None:
+            async with async_playwright() as p:
+                browser = await launch_browser(p)
+                try:
+                    context = await new_context(browser, block_resources)
+                    result = await extract_gemini_chat(
+                        context,
+                        url,
+                        output_dir="output",
+                        **{**options, "http_first": False},
+                    )
+                finally:
+                    await browser.close()
 
         # Copy the result to the specified output file
         if "error" not in result:
             output_path = Path(output_file)
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
+            await dump_json(result, output_file)
             print(f"✓ Saved to: {output_file}\n")
         else:
             # Save error result
             output_path = Path(output_file)
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
+            await dump_json(result, output_file)
             print(f"✗ Error saved to: {output_file}\n")
 
         return
@@ -292,42 +431,83 @@ async def main():
     ]
 
     # Allow custom URLs from command line
-    if len(sys.argv) > 1:
-        urls = sys.argv[1:]
+    if args:
+        urls = args
 
     print("\n" + "=" * 60)
     print("GEMINI CHAT EXTRACTOR")
     print("=" * 60)
     print(f"\nProcessing {len(urls)} URL(s)...")
 
-    results = []
-    for url in urls:
-        result = await extract_gemini_chat(url)
-        results.append(result)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_URLS)
+    results = [None] * len(urls)
+
+    if http_first:
+        # Try every URL over plain HTTP first; only the misses need a browser
+        async def fetch(url):
+            async with semaphore:
+                result = await extract_over_http(url, Path("output"))
+            # Keep only metadata so finished chats can be freed right away
+            return None if result is None else summarize_result(url, result)
+
+        results = await asyncio.gather(
+            *(fetch(url) for url in urls), return_exceptions=True
+        )
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        async with async_playwright() as p:
+            # Launch once and open every URL as a page in one shared context
+            browser = await launch_browser(p)
+
+            async def run(url):
+                async with semaphore:
+                    result = await extract_gemini_chat(
+                        context, url, **{**options, "http_first": False}
+                    )
+                return summarize_result(url, result)
+
+            try:
+                context = await new_context(browser, block_resources)
+                # Pages load and scroll concurrently, bounded by the semaphore
+                fallback = await asyncio.gather(
+                    *(run(urls[i]) for i in pending), return_exceptions=True
+                )
+            finally:
+                await browser.close()
+
+        for i, result in zip(pending, fallback):
+            results[i] = result
+
+    results = [
+        (
+            summarize_result(url, {"error": str(result)})
+            if isinstance(result, BaseException)
+            else result
+        )
+        for url, result in zip(urls, results)
+    ]
 
     # Save summary
     output_path = Path("output")
     output_path.mkdir(parents=True, exist_ok=True)
 
     summary_file = (
-        output_path / f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output_path / f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json.gz"
+    )
+    await dump_summary(
+        {
+            "timestamp": datetime.now().isoformat(),
+            "total_urls": len(urls),
+            "successful": sum(1 for r in results if "error" not in r),
+            "failed": sum(1 for r in results if "error" in r),
+            "results": results,
+        },
+        summary_file,
     )
-    with open(summary_file, "w", encoding="utf-8") as f:
-        json.dump(
-            {
-                "timestamp": datetime.now().isoformat(),
-                "total_urls": len(urls),
-                "successful": sum(1 for r in results if "error" not in r),
-                "failed": sum(1 for r in results if "error" in r),
-                "results": results,
-            },
-            f,
-            indent=2,
-            ensure_ascii=False,
-        )
 
-    print(f"\n✓ Summary saved: {summary_file}\n")
+    print(f"\n✓ Summary saved (gzip): {summary_file}\n")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
@@ -0,0 +1,27 @@
+#!/bin/sh
+
+# Start a long-lived headless Chromium that extractors can attach to over CDP,
+# so each run skips browser startup:
+#   export CLAUDE_EXTRACTOR_CDP=http://localhost:9222
+
+# Use CDP_PORT environment variable if set, otherwise default to 9222
+CDP_PORT=${CDP_PORT:-9222}
+
+# Use CHROME_BIN if set, otherwise the Chromium installed by Patchright
+if [ -z "$CHROME_BIN" ]; then
+  CHROME_BIN=$(cd "$(dirname "$0")" && uv run python -c "
+from patchright.sync_api import sync_playwright
+with sync_playwright() as p:
+    print(p.chromium.executable_path)
+")
+fi
+
+exec "$CHROME_BIN" \
+  --headless=new \
+  --remote-debugging-port="$CDP_PORT" \
+  --no-sandbox \
+  --disable-setuid-sandbox \
+  --disable-dev-shm-usage \
+  --disable-blink-features=AutomationControlled \
+  --disable-web-security \
+  about:blank